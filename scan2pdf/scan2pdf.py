@@ -3,37 +3,64 @@
 """scan2pdf
 
 Usage:
-  scan2pdf -L
+  scan2pdf -L [--no-cache]
   scan2pdf --create-configuration DEVICE [CONFIG]
-  scan2pdf [--debug] [-C CONFIG] DEVICE TARGET
+  scan2pdf [--debug] [-C CONFIG] [--output-dpi DPI] DEVICE TARGET
 
 Options:
   -L, --list-devices                 show available scanner devices
+  --no-cache                         probe for devices even if a recent list is cached
   DEVICE                             device to use for scanning
   TARGET                             target filename for scan
   CONFIG                             configuration file
   -C CONFIG, --configuration CONFIG  configuration options in JSON format
   --debug                            print debug information on error
   --create-configuration             create a configuration file with defaults
+  --output-dpi DPI                   downsample scans above DPI before embedding
 """
 
 import sys
 import json
 import os
-import os.path
 import ctypes
 import re
 import io
-
-from copy import deepcopy
-from collections import OrderedDict
+import queue
+import threading
+import time
 
 from docopt import docopt
+from PIL import Image
 import pyinsane.abstract as pyinsane
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.pagesizes import inch, cm, A4
-from reportlab.platypus import Image as LabImage
+SOFT_SELECT = pyinsane.SaneCapabilities.SOFT_SELECT
+HARD_SELECT = pyinsane.SaneCapabilities.HARD_SELECT
+SOFT_DETECT = pyinsane.SaneCapabilities.SOFT_DETECT
+AUTOMATIC = pyinsane.SaneCapabilities.AUTOMATIC
+INACTIVE = pyinsane.SaneCapabilities.INACTIVE
+
+SELECT_MASK = SOFT_SELECT | HARD_SELECT
+SOFT_MASK = SOFT_SELECT | SOFT_DETECT
+
+TYPE_BOOL = int(pyinsane.rawapi.SaneValueType.BOOL)
+TYPE_INT = int(pyinsane.rawapi.SaneValueType.INT)
+TYPE_FIXED = int(pyinsane.rawapi.SaneValueType.FIXED)
+TYPE_STRING = int(pyinsane.rawapi.SaneValueType.STRING)
+TYPE_BUTTON = int(pyinsane.rawapi.SaneValueType.BUTTON)
+TYPE_GROUP = int(pyinsane.rawapi.SaneValueType.GROUP)
+
+CONSTRAINT_NONE = int(pyinsane.rawapi.SaneConstraintType.NONE)
+CONSTRAINT_RANGE = int(pyinsane.rawapi.SaneConstraintType.RANGE)
+CONSTRAINT_WORD_LIST = int(pyinsane.rawapi.SaneConstraintType.WORD_LIST)
+CONSTRAINT_STRING_LIST = int(pyinsane.rawapi.SaneConstraintType.STRING_LIST)
+
+RE_VALUE_STRING = re.compile(r'(?P<quote>\"|\')(?P<value>.*)(?P=quote)')
+
+# seconds a cached device list is reused for
+DEVICE_CACHE_TTL = 60
+
+# indexed by SANE_Unit
+UNITS = ('', 'pixel', 'bit', 'mm', 'dpi', '%', 'µs')
 
 
 class Error(Exception):
@@ -70,16 +97,62 @@ def main():
             sys.exit(-1)
 
 def main_list_devices(cmdline):
+    names = None if cmdline['--no-cache'] else load_device_cache()
+
+    if names is None:
+        try:
+            devices = pyinsane.get_devices()
+        except Exception as ex:
+            raise Error('Unable to list devices. Is sane installed?', inner=ex)
+
+        if len(devices) == 0:
+            raise Error('no devices found')
+
+        names = [device.name for device in devices]
+        save_device_cache(names)
+
+    for name in names:
+        print(name)
+
+def device_cache_path():
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_dir, 'scan2pdf', 'devices.json')
+
+def load_device_cache():
+    filename = device_cache_path()
+
     try:
-        devices = pyinsane.get_devices()
-    except Exception as ex:
-        raise Error('Unable to list devices. Is sane installed?', inner=ex)
+        if os.stat(filename).st_mtime <= time.time() - DEVICE_CACHE_TTL:
+            return None
+
+        with open(filename, 'r') as fp:
+            names = json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(names, list) or len(names) == 0:
+        return None
+
+    return names
 
-    if len(devices) == 0:
-        raise Error('no devices found')
+def save_device_cache(names):
+    filename = device_cache_path()
 
-    for device in devices:
-        print(device.name)
+    tmp_filename = '%s.%d.tmp' % (filename, os.getpid())
+
+    # the cache is only an optimisation, failing to write it is not an error
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        with open(tmp_filename, 'w') as fp:
+            json.dump(names, fp)
+
+        os.replace(tmp_filename, filename)
+    except OSError:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
 
 def main_create_configuration(cmdline):
     device = pyinsane.Scanner(name=cmdline['DEVICE'])
@@ -91,12 +164,16 @@ def main_create_configuration(cmdline):
 
 
     def iter_options():
+        handle = pyinsane.sane_dev_handle[1]
+        get_descriptor = pyinsane.rawapi.sane_get_option_descriptor
+        build_option = pyinsane.ScannerOption.build_from_rawapi
+
         try:
-            nb_options = pyinsane.rawapi.sane_get_option_value(pyinsane.sane_dev_handle[1], 0)
+            nb_options = pyinsane.rawapi.sane_get_option_value(handle, 0)
 
             for opt_idx in range(1, nb_options):
-                opt_desc = pyinsane.rawapi.sane_get_option_descriptor(pyinsane.sane_dev_handle[1], opt_idx)
-                opt = pyinsane.ScannerOption.build_from_rawapi(device, opt_idx, opt_desc)
+                opt_desc = get_descriptor(handle, opt_idx)
+                opt = build_option(device, opt_idx, opt_desc)
                 yield opt
 
         except Exception as ex:
@@ -108,30 +185,29 @@ def main_create_configuration(cmdline):
         for opt in iter_options():
 
             # group
-            if opt.val_type == pyinsane.rawapi.SaneValueType.GROUP:
+            if int(opt.val_type) == TYPE_GROUP:
                 grp = opt
                 continue
 
+            caps = int(opt.capabilities)
+
+            # only worry about settable values
+            # checked first as it rejects the most options, and implies the option is not useless
+            if not (caps & SOFT_SELECT):
+                continue
+
             # if both of these are set, option is invalid
-            if (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_SELECT) and (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.HARD_SELECT):
+            if (caps & SELECT_MASK) == SELECT_MASK:
                 continue
 
             # invalid to select but not detect
-            if (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_SELECT) and not (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_DETECT):
+            if (caps & SOFT_MASK) == SOFT_SELECT:
                 continue
 
             # standard allows this, though it makes little sense
-            # if (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.HARD_SELECT) and not (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_DETECT):
+            # if (caps & HARD_SELECT) and not (caps & SOFT_DETECT):
             #    continue
 
-            # if one of these three is not set, option is useless, skip it
-            if not (opt.capabilities._SaneFlags__flags & (pyinsane.SaneCapabilities.SOFT_SELECT | pyinsane.SaneCapabilities.HARD_SELECT | pyinsane.SaneCapabilities.SOFT_DETECT)):
-                continue
-
-            # only worry about settable values
-            if not (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_SELECT):
-                continue
-
             # yield group with first valid option
             if grp is not None:
                 yield grp
@@ -146,88 +222,79 @@ def main_create_configuration(cmdline):
         yield ''
 
         for opt in iter_filtered_options():
+            val_type = int(opt.val_type)
 
             # group
-            if opt.val_type == pyinsane.rawapi.SaneValueType.GROUP:
-                yield '[%(name)s]' % dict(
-                    name = opt.name
-                )
+            if val_type == TYPE_GROUP:
+                yield '[%s]' % opt.name
                 continue
 
             # option
 
-            yield '# %(title)s' % dict(
-                title = opt.title
-            )
-            yield '# %(desc)s' % dict(
-                desc = opt.desc
-            )
+            yield '# %s' % opt.title
+            yield '# %s' % opt.desc
+
+            constraint_type = int(opt.constraint_type)
 
             valid = ''
-            if opt.val_type == pyinsane.rawapi.SaneValueType.BOOL:
+            if val_type == TYPE_BOOL:
                 valid = 'yes|no'
-            elif opt.val_type != pyinsane.rawapi.SaneValueType.BUTTON:
+            elif val_type != TYPE_BUTTON:
 
                 valid = ''
-                if opt.constraint_type == pyinsane.rawapi.SaneConstraintType.NONE:
-                    if opt.val_type == pyinsane.rawapi.SaneValueType.INT:
+                if constraint_type == CONSTRAINT_NONE:
+                    if val_type == TYPE_INT:
                         valid = '<int>'
-                    elif opt.val_type == pyinsane.rawapi.SaneValueType.FIXED:
+                    elif val_type == TYPE_FIXED:
                         valid = '<float>'
-                    elif opt.val_type == pyinsane.rawapi.SaneValueType.STRING:
+                    elif val_type == TYPE_STRING:
                         valid = '<string>'
 
-                    if opt.val_type != pyinsane.rawapi.SaneValueType.STRING and opt.size > ctypes.sizeof(ctypes.c_int):
+                    if val_type != TYPE_STRING and opt.size > ctypes.sizeof(ctypes.c_int):
                         valid = valid + ',...'
 
-                elif opt.constraint_type == pyinsane.rawapi.SaneConstraintType.RANGE:
+                elif constraint_type == CONSTRAINT_RANGE:
                     # ToDo: see scanimage. might need to adjust x and y
                     valid_from, valid_to, valid_step = opt.constraint
-                    valid_unit = get_unit(opt.unit._SaneEnum__value)
+                    valid_unit = get_unit(int(opt.unit))
 
-                    if opt.val_type != pyinsane.rawapi.SaneValueType.STRING and opt.size > ctypes.sizeof(ctypes.c_int):
+                    if val_type != TYPE_STRING and opt.size > ctypes.sizeof(ctypes.c_int):
                         valid_extra = ',...'
                     else:
                         valid_extra = ''
 
-                    if opt.val_type == pyinsane.rawapi.SaneValueType.INT:
-                        valid = '%(from_)d..%(to)d%(unit)s%(extra)s (in steps of %(step)d)' % dict(
-                            from_ = valid_from,
-                            to = valid_to,
-                            extra = valid_extra,
-                            step = valid_step,
-                            unit = valid_unit
+                    if val_type == TYPE_INT:
+                        valid = '%d..%d%s%s (in steps of %d)' % (
+                            valid_from, valid_to, valid_unit, valid_extra, valid_step
                         )
                     else:
-                        valid = '%(from_)g..%(to)g%(unit)s%(extra)s (in steps of %(step)g)' % dict(
-                            from_ = unfix(valid_from),
-                            to = unfix(valid_to),
-                            extra = valid_extra,
-                            step = unfix(valid_step),
-                            unit = valid_unit
+                        valid = '%g..%g%s%s (in steps of %g)' % (
+                            unfix(valid_from), unfix(valid_to), valid_unit, valid_extra, unfix(valid_step)
                         )
-                elif opt.constraint_type == pyinsane.rawapi.SaneConstraintType.WORD_LIST:
-                    if opt.val_type == pyinsane.rawapi.SaneValueType.INT:
+                elif constraint_type == CONSTRAINT_WORD_LIST:
+                    if val_type == TYPE_INT:
                         valid_words = ('%d' % word for word in opt.constraint)
                     else:
                         valid_words = ('%g' % unfix(word) for word in opt.constraint)
                     valid = '|'.join(valid_words)
 
-                    if opt.val_type != pyinsane.rawapi.SaneValueType.STRING and opt.size > ctypes.sizeof(ctypes.c_int):
+                    if val_type != TYPE_STRING and opt.size > ctypes.sizeof(ctypes.c_int):
                         valid = valid + ',...'
-                elif opt.constraint_type == pyinsane.rawapi.SaneConstraintType.STRING_LIST:
+                elif constraint_type == CONSTRAINT_STRING_LIST:
                     valid = '|'.join('%r' % string for string in opt.constraint)
 
 
-            if opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.AUTOMATIC:
+            caps = int(opt.capabilities)
+
+            if caps & AUTOMATIC:
                 valid = 'auto|' + valid
 
             flags = []
-            if (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.INACTIVE):
+            if (caps & INACTIVE):
                 flags.append('[inactive]')
-            if (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.HARD_SELECT):
+            if (caps & HARD_SELECT):
                 flags.append('[hardware]')
-            if not (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_SELECT) and (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.SOFT_DETECT):
+            if not (caps & SOFT_SELECT) and (caps & SOFT_DETECT):
                 flags.append('[read-only]')
 
             if len(flags) != 0:
@@ -236,46 +303,32 @@ def main_create_configuration(cmdline):
                 flags = ''
 
 
-            yield '# %(name)s = %(valid)s%(flags)s' % dict(
-                name = opt.name,
-                valid = valid,
-                flags = flags
-            )
+            yield '# %s = %s%s' % (opt.name, valid, flags)
 
-            if opt.val_type == pyinsane.rawapi.SaneValueType.STRING or opt.size == ctypes.sizeof(ctypes.c_int):
-                if not (opt.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.INACTIVE):
+            if val_type == TYPE_STRING or opt.size == ctypes.sizeof(ctypes.c_int):
+                if not (caps & INACTIVE):
                     value = ''
-                    if opt.val_type == pyinsane.rawapi.SaneValueType.BOOL:
+                    if val_type == TYPE_BOOL:
                         value = 'yes' if opt.val_type else 'no'
-                    elif opt.val_type == pyinsane.rawapi.SaneValueType.INT:
+                    elif val_type == TYPE_INT:
                         # ToDo: see scanimage
                         value = '%d' % opt.value
-                    elif opt.val_type == pyinsane.rawapi.SaneValueType.FIXED:
+                    elif val_type == TYPE_FIXED:
                         # ToDo: see scanimage
                         value = '%g' % unfix(opt.value)
-                    elif opt.val_type == pyinsane.rawapi.SaneValueType.STRING:
+                    elif val_type == TYPE_STRING:
                         value = '%r' % opt.value
 
-                    yield '%(name)s = %(value)s' % dict(
-                        name = opt.name,
-                        value = value
-                    )
+                    yield '%s = %s' % (opt.name, value)
                 else:
-                    yield '# %(name)s = ' % dict(
-                        name = opt.name
-                    )
+                    yield '# %s = ' % opt.name
             else:
-                yield '# %(name)s = ' % dict(
-                    name=opt.name
-                )
+                yield '# %s = ' % opt.name
 
             yield ''
 
     def get_unit(value):
-        try:
-            return ['', 'pixel', 'bit', 'mm', 'dpi', '%', 'µs'][value]
-        except IndexError as ex:
-            return ''
+        return UNITS[value] if 0 <= value < len(UNITS) else ''
 
     def unfix(value):
         return float(value) / (1 << 16)
@@ -288,13 +341,23 @@ def main_create_configuration(cmdline):
             raise Error('Unable to write configuration file "%s"' % filename, inner=ex)
 
         with fp:
-            for line in iter_config():
-                print(line, file=fp)
+            fp.write('\n'.join(iter_config()))
+            fp.write('\n')
     else:
         for line in iter_config():
             print(line)
 
 def main_scan(cmdline):
+    output_dpi = cmdline['--output-dpi']
+    if output_dpi is not None:
+        try:
+            output_dpi = int(output_dpi)
+        except ValueError as ex:
+            raise Error('Invalid output dpi "%s"' % output_dpi, inner=ex)
+
+        if output_dpi <= 0:
+            raise Error('Invalid output dpi "%d"' % output_dpi)
+
     device = pyinsane.Scanner(name=cmdline['DEVICE'])
     try:
         device._open()
@@ -309,21 +372,94 @@ def main_scan(cmdline):
         except StopIteration:
             raise Error('Nothing to scan')
 
-        while True:
+        try:
+            while True:
+                try:
+                    session.scan.read()
+                except EOFError:
+                    # MultipleScan signals the end of the feeder with an EOFError that carries no page
+                    if not session.images:
+                        continue
+
+                    # take ownership of the page so the session does not keep every scan alive
+                    img = session.images.pop()
+
+                    # Set DPI if possible
+                    if 'dpi' not in img.info and 'resolution' in device.options:
+                        img.info['dpi'] = (device.options['resolution'].value, device.options['resolution'].value)
+
+                    yield img
+                except StopIteration:
+                    return
+        finally:
+            # stops the feeder if the pdf could not be written
+            session.scan.cancel()
+
+    # scan the next page while the current one is being written
+    scanned = iter_background(iter_scan())
+
+    images = scanned
+    if output_dpi is not None:
+        images = (downsample(img, output_dpi) for img in scanned)
+
+    try:
+        images2pdf(images, cmdline['TARGET'])
+    finally:
+        # stop the worker and cancel the scan even if writing the pdf failed
+        scanned.close()
+
+def iter_background(iterable, maxsize=2):
+    '''
+    Iterate over iterable on a worker thread.
+    At most maxsize items are buffered ahead of the consumer.
+    Exceptions raised by the iterable are re-raised in the consumer.
+    '''
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        # give up once the consumer has stopped listening
+        while not stop.is_set():
             try:
-                session.scan.read()
-            except EOFError:
-                img = session.images[-1]
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
 
-                # Set DPI if possible
-                if 'dpi' not in img.info and 'resolution' in device.options:
-                    img.info['dpi'] = (device.options['resolution'].value, device.options['resolution'].value)
+        return False
 
-                yield img
-            except StopIteration:
-                return
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+            else:
+                put((done, None))
+        except BaseException as ex:
+            put((done, ex))
+        finally:
+            # let a generator clean up, e.g. cancel a scan in progress
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, ex = items.get()
+            if item is done:
+                break
+
+            yield item
+    finally:
+        stop.set()
+        thread.join()
 
-    images2pdf(iter_scan(), cmdline['TARGET'])
+    if ex is not None:
+        raise ex
 
 def apply_configuration(cmdline, device):
     filename = cmdline['--configuration']
@@ -337,46 +473,37 @@ def apply_configuration(cmdline, device):
         except Exception as ex:
             raise Error('Unable to read configuration file "%s"' % filename, inner=ex)
 
-        re_comment = re.compile(r'^#.*$')
-        re_empty = re.compile(r'^\s*$')
-        re_group = re.compile(r'^\s*\[(?P<group>.*)\]\s*$')
-        re_option = re.compile(r'^\s*(?P<name>.*?)\s*=\s*(?P<value>.*?)\s*$')
-
         with fp:
             for iline, line in enumerate(fp):
-                # comment
-                if re_comment.match(line):
-                    continue
+                line = line.strip()
 
-                # empty
-                if re_empty.match(line):
+                # comment or empty
+                if not line or line[0] == '#':
                     continue
 
                 # group
-                match = re_group.match(line)
-                if match:
+                if line[0] == '[' and line[-1] == ']':
                     continue
 
                 # option
-                match = re_option.match(line)
-                if match:
-                    yield (match.group('name'), match.group('value'))
+                name, sep, value = line.partition('=')
+                if sep:
+                    yield (name.rstrip(), value.lstrip())
                     continue
 
                 raise Error('Invalid syntax on line %d of configuration file "%s"' % (iline + 1, filename))
 
-    re_value_string = re.compile(r'(?P<quote>\"|\')(?P<value>.*)(?P=quote)')
-
     for name, value in iter_settings():
 
         if name not in device.options:
             raise Error('Unknown option "%s" in configuration file "%s"' % (name, filename))
 
         option = device.options[name]
+        val_type = int(option.val_type)
 
-        if value.lower() == 'auto' and (option.capabilities._SaneFlags__flags & pyinsane.SaneCapabilities.AUTOMATIC):
+        if value.lower() == 'auto' and (int(option.capabilities) & AUTOMATIC):
             pass
-        elif option.val_type == pyinsane.rawapi.SaneValueType.BOOL:
+        elif val_type == TYPE_BOOL:
             value = value.lower()
             if value == 'yes':
                 value = True
@@ -385,20 +512,20 @@ def apply_configuration(cmdline, device):
             else:
                 raise Error('invalid value for option "%s" in configuration file "%s"' % (name, filename))
 
-        elif option.val_type == pyinsane.rawapi.SaneValueType.INT:
+        elif val_type == TYPE_INT:
             try:
                 value = int(value)
             except ValueError as ex:
                 raise Error('invalid value for option "%s" in configuration file "%s"' % (name, filename), inner = ex)
-        elif option.val_type == pyinsane.rawapi.SaneValueType.FIXED:
+        elif val_type == TYPE_FIXED:
             try:
                 value = float(value)
             except ValueError as ex:
                 raise Error('invalid value for option "%s" in configuration file "%s"' % (name, filename), inner = ex)
 
             value = int(value*(1 << 16))
-        elif option.val_type == pyinsane.rawapi.SaneValueType.STRING:
-            match = re_value_string.match(value)
+        elif val_type == TYPE_STRING:
+            match = RE_VALUE_STRING.match(value)
             if match is None:
                 raise Error('invalid value for option "%s" in configuration file "%s"' % (name, filename), inner=ex)
 
@@ -412,15 +539,60 @@ def apply_configuration(cmdline, device):
         except Exception as ex:
             raise Error('unable to set option "%s"', inner=ex)
 
-def pil2lab(img):
-    dpiw, dpih = img.info['dpi'] if 'dpi' in img.info else (1, 1)
+def downsample(img, dpi):
+    if 'dpi' not in img.info:
+        return img
+
+    srcw, srch = img.info['dpi']
+    if srcw <= dpi and srch <= dpi:
+        return img
+
+    dpiw, dpih = min(srcw, dpi), min(srch, dpi)
+    size = (
+        max(1, int(round(float(img.width) * dpiw / srcw))),
+        max(1, int(round(float(img.height) * dpih / srch)))
+    )
+
+    img = img.resize(size, Image.LANCZOS)
+    img.info['dpi'] = (dpiw, dpih)
+    return img
+
+def is_bilevel(img):
+    if img.mode == '1':
+        return True
+
+    # pyinsane unpacks lineart scans into 'L' images holding only black and white
+    if img.mode != 'L':
+        return False
+
+    colors = img.getcolors(2)
+    return colors is not None and set(color for _, color in colors) <= {0, 255}
+
+def pil2reader(img, quality=85):
+    from reportlab.lib.utils import ImageReader
+
+    # bilevel scans stay lossless, jpeg would smear the edges and grow the file
+    if is_bilevel(img):
+        return ImageReader(img.convert('L'))
 
+    if img.mode not in ('L', 'RGB'):
+        img = img.convert('RGB')
+
+    # reportlab embeds jpeg files as-is (DCTDecode) rather than as flate compressed pixels
     buf = io.BytesIO()
-    img.save(buf, 'TIFF')
+    img.save(buf, 'JPEG', quality=quality)
     buf.seek(0)
-    return LabImage(buf, width=float(img.width) / dpiw * inch, height=float(img.height) / dpih * inch)
+    return ImageReader(buf)
 
 def images2pdf(images, filename):
+    # reportlab is slow to import and only needed when scanning
+    from reportlab import rl_config
+    from reportlab.pdfgen.canvas import Canvas
+    from reportlab.lib.units import inch, cm
+
+    # write binary streams, ascii85 would grow every embedded image by a quarter
+    rl_config.useA85 = 0
+
     images = iter(images)
 
     try:
@@ -428,36 +600,24 @@ def images2pdf(images, filename):
     except StopIteration:
         raise Error('Nothing scanned')
 
-    img = pil2lab(img)
-
-    doc = SimpleDocTemplate(
-        filename,
-        pagesize=(
-            img._width + 1.5 * cm,
-            img._height + 2.0 * cm
-        ),
-        showBoundary=1,
-        leftMargin=0.5 * cm, rightMargin=0.5 * cm, topMargin=0.5 * cm, bottomMargin=1.0 * cm
-        # leftMargin=0, rightMargin=0, topMargin=0, bottomMargin=0
-    )
-
-    def iter_flowables():
-        nonlocal img
-        yield img
+    # Pages are written to the canvas one at a time so that only the current scan is held in memory
+    pdf = Canvas(filename)
 
-        while True:
-            try:
-                img = next(images)
-            except StopIteration:
-                break
+    while True:
+        dpiw, dpih = img.info['dpi'] if 'dpi' in img.info else (1, 1)
+        width = float(img.width) / dpiw * inch
+        height = float(img.height) / dpih * inch
 
-            img = pil2lab(img)
+        pdf.setPageSize((width + 1.5 * cm, height + 2.0 * cm))
+        pdf.drawImage(pil2reader(img), 0.5 * cm, 1.0 * cm, width=width, height=height)
+        pdf.showPage()
 
-            yield PageBreak()
-            yield img
+        try:
+            img = next(images)
+        except StopIteration:
+            break
 
-    # ToDo: Change this into something that can consume less memory?
-    doc.build(list(iter_flowables()))
+    pdf.save()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file